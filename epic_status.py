@@ -1,9 +1,21 @@
+import ijson
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+import hashlib
 import json
 import time
-from typing import Dict, List, Optional, Any
-from markdown import markdown
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from importlib import metadata
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+from jinja2 import Environment
+from markdown import Markdown
+from markupsafe import Markup
 from html import escape
 import logging
 import os
@@ -19,22 +31,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Ограничение параллельных запросов к Jira, чтобы не упираться в rate limit
+JIRA_MAX_CONCURRENT_REQUESTS = 8
+
+# Поля задач, которые используются при анализе и генерации страницы
+ISSUE_FIELDS = ["summary", "status", "assignee", "updated", "description", "issuetype", "priority"]
+# Для вложенных объектов достаточно одного атрибута
+NESTED_FIELD_KEYS = {"status": "name", "issuetype": "name", "priority": "name", "assignee": "displayName"}
+
+# Тексты, которые подставляются вместо анализа, если DeepSeek не ответил
+ANALYSIS_EMPTY = "Анализ недоступен"
+ANALYSIS_UNAVAILABLE = "Анализ временно недоступен"
+
+# Каталог для локального кэша между запусками
+CACHE_DIR = ".cache"
+# Время жизни кэша информации об эпике, в секундах
+EPIC_INFO_TTL = 3600
+
+# Конфигурация заполняется в main() после load_config()
+CONFIG: Dict[str, Any] = {}
+
+# Сессии с пулом keep-alive соединений, общие для всех запросов к сервису
+JIRA_SESSION = requests.Session()
+CONF_SESSION = requests.Session()
+DS_SESSION = requests.Session()
+
 def check_dependencies():
     """Проверяет наличие всех необходимых зависимостей."""
+    try:
+        from packaging.version import parse as parse_version
+    except ImportError:
+        logger.error("Модуль packaging, необходимый для проверки зависимостей, не установлен")
+        logger.info("Пожалуйста, установите зависимости командой: pip install -r requirements.txt")
+        sys.exit(1)
+    
     required = {
         'requests': ('2.31.0', 'HTTP-запросы к API'),
         'markdown': ('3.4.4', 'Преобразование Markdown в HTML'),
+        'ijson': ('3.2.0', 'Потоковый разбор JSON-ответов Jira'),
+        'orjson': ('3.8.0', 'Быстрая сериализация JSON'),
+        'Jinja2': ('3.1.0', 'Шаблон HTML-страницы Confluence'),
+        'packaging': ('21.0', 'Сравнение версий зависимостей'),
         'python-dotenv': ('1.0.0', 'Загрузка переменных окружения')
     }
     
     missing = []
     for package, (min_version, purpose) in required.items():
         try:
-            importlib.import_module(package)
-            installed_version = pkg_resources.get_distribution(package).version
-            if pkg_resources.parse_version(installed_version) < pkg_resources.parse_version(min_version):
+            installed_version = metadata.version(package)
+            if parse_version(installed_version) < parse_version(min_version):
                 missing.append(f"{package}>={min_version} (установлено {installed_version}) - {purpose}")
-        except ImportError:
+        except metadata.PackageNotFoundError:
             missing.append(f"{package}>={min_version} - {purpose}")
     
     if missing:
@@ -49,6 +96,10 @@ def create_default_requirements():
     default_content = """# Основные зависимости
 requests>=2.31.0
 markdown>=3.4.4
+ijson>=3.2.0
+orjson>=3.8.0
+Jinja2>=3.1.0
+packaging>=21.0
 python-dotenv>=1.0.0
 
 # Дополнительные зависимости для разработки
@@ -75,72 +126,159 @@ def load_config(config_path: str = "config.json") -> Dict[str, Any]:
     except json.JSONDecodeError:
         raise ValueError(f"Неверный формат JSON в файле {config_path}")
 
+def load_cache(name: str) -> Optional[Dict[str, Any]]:
+    """Читает запись локального кэша, при отсутствии или повреждении возвращает None."""
+    try:
+        with open(os.path.join(CACHE_DIR, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def save_cache(name: str, data: Dict[str, Any]) -> None:
+    """Атомарно записывает запись локального кэша."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def configure_sessions() -> None:
+    """Настраивает авторизацию, заголовки и пул соединений HTTP-сессий."""
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    # Поиск задач в Jira идет через POST, но только читает данные, поэтому его можно повторять
+    jira_retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"}
+    )
+    adapters = [
+        # Все обращения к Jira делят ограниченный набор keep-alive соединений: параллельные
+        # страницы ждут свободное соединение, а не открывают новые сверх лимита
+        (JIRA_SESSION, HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=JIRA_MAX_CONCURRENT_REQUESTS,
+            pool_block=True,
+            max_retries=jira_retry
+        )),
+        (CONF_SESSION, HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)),
+        (DS_SESSION, HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
+    ]
+    for session, adapter in adapters:
+        session.mount("https://", adapter)
+        # gzip и deflate requests запрашивает и по умолчанию; ACCEPT_ENCODING добавляет
+        # к ним br/zstd, только если установлены декодеры для них
+        session.headers.update({"Accept": "application/json", "Accept-Encoding": ACCEPT_ENCODING})
+    
+    JIRA_SESSION.auth = HTTPBasicAuth(CONFIG["jira"]["api_user"], CONFIG["jira"]["api_token"])
+    CONF_SESSION.auth = HTTPBasicAuth(CONFIG["confluence"]["api_user"], CONFIG["confluence"]["api_token"])
+    DS_SESSION.headers.update({
+        "Authorization": f"Bearer {CONFIG['deepseek']['api_key']}",
+        "Content-Type": "application/json"
+    })
+
 def get_epic_info(epic_key: str) -> Dict[str, Any]:
     """Получает информацию об эпике из Jira."""
+    cache_name = f"epic_info_{epic_key}.json"
+    cached = load_cache(cache_name)
+    if cached and time.time() - cached.get("fetched_at", 0) < EPIC_INFO_TTL:
+        return cached["info"]
+    
     url = f"{CONFIG['jira']['url']}/rest/api/3/issue/{epic_key}?fields=summary,description"
     try:
-        response = requests.get(
-            url,
-            auth=HTTPBasicAuth(CONFIG["jira"]["api_user"], CONFIG["jira"]["api_token"]),
-            timeout=30
-        )
+        response = JIRA_SESSION.get(url, timeout=30)
         response.raise_for_status()
         
-        fields = response.json().get("fields", {})
-        return {
+        fields = orjson.loads(response.content).get("fields", {})
+        info = {
             "key": epic_key,
             "summary": fields.get("summary", ""),
             "description": fields.get("description", "")
         }
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         raise ConnectionError(f"Ошибка подключения к Jira: {str(e)}")
+    
+    save_cache(cache_name, {"fetched_at": time.time(), "info": info})
+    return info
+
+def extract_minimal(issue: Dict[str, Any]) -> Dict[str, Any]:
+    """Оставляет у задачи только поля, нужные для анализа и генерации страницы."""
+    fields = issue.get("fields") or {}
+    minimal = {}
+    for name in ISSUE_FIELDS:
+        if name not in fields:
+            continue
+        value = fields[name]
+        attr = NESTED_FIELD_KEYS.get(name)
+        if attr and isinstance(value, dict):
+            value = {attr: value[attr]} if attr in value else {}
+        minimal[name] = value
+    return {"key": issue.get("key", "N/A"), "fields": minimal}
 
 def get_jira_issues(epic_key: str) -> List[Dict[str, Any]]:
     """Получает все задачи, связанные с эпиком."""
-    jql = f'\"Epic Link\" = {epic_key} OR \"Parent Link\" = {epic_key}'
-    fields = "summary,status,assignee,updated,description,comment,issuetype,priority"
-    start_at = 0
+    # Ключ задачи разрешает совпадения по updated, чтобы границы страниц не зависели от
+    # порядка равных задач. Задача, обновленная во время загрузки, все равно может
+    # сместиться между страницами и попасть в результат дважды или не попасть вовсе
+    jql = f'\"Epic Link\" = {epic_key} OR \"Parent Link\" = {epic_key} ORDER BY updated DESC, key ASC'
+    url = f"{CONFIG['jira']['url']}/rest/api/3/search"
     max_results = 100
-    all_issues = []
     
-    while True:
-        url = f"{CONFIG['jira']['url']}/rest/api/3/search?jql={jql}&fields={fields}&startAt={start_at}&maxResults={max_results}"
-        try:
-            response = requests.get(
-                url,
-                auth=HTTPBasicAuth(CONFIG["jira"]["api_user"], CONFIG["jira"]["api_token"]),
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            all_issues.extend(data.get("issues", []))
-            
-            if start_at + max_results >= data.get("total", 0):
-                break
-            start_at += max_results
-        except requests.exceptions.RequestException as e:
-            raise ConnectionError(f"Ошибка подключения к Jira: {str(e)}")
+    def search(start_at: int, limit: int, stream: bool = False) -> requests.Response:
+        response = JIRA_SESSION.post(
+            url,
+            headers={"Content-Type": "application/json"},
+            data=orjson.dumps({
+                "jql": jql,
+                "fields": ISSUE_FIELDS,
+                "startAt": start_at,
+                "maxResults": limit
+            }),
+            stream=stream,
+            timeout=30
+        )
+        response.raise_for_status()
+        return response
     
-    return sorted(
-        all_issues,
-        key=lambda x: x.get("fields", {}).get("updated", ""),
-        reverse=True
-    )
+    def fetch_page(start_at: int) -> List[Dict[str, Any]]:
+        # Страница разбирается потоково, задачи сразу сокращаются до нужных полей.
+        # ijson читает response.raw напрямую, поэтому ошибки чтения приходят из urllib3
+        with search(start_at, max_results, stream=True) as response:
+            response.raw.decode_content = True
+            return [extract_minimal(issue) for issue in ijson.items(response.raw, "issues.item")]
+    
+    try:
+        # Пустой запрос сообщает общее число задач, страницы запрашиваются параллельно
+        probe = search(0, 0)
+        logger.debug(f"Сжатие ответов Jira: {probe.headers.get('Content-Encoding', 'нет')}")
+        total = orjson.loads(probe.content).get("total", 0)
+        offsets = list(range(0, total, max_results))
+        all_issues = []
+        
+        if offsets:
+            workers = min(JIRA_MAX_CONCURRENT_REQUESTS, len(offsets))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # map() возвращает страницы в порядке смещений, сохраняя сортировку Jira
+                for page in executor.map(fetch_page, offsets):
+                    all_issues.extend(page)
+    except (requests.exceptions.RequestException, Urllib3HTTPError, orjson.JSONDecodeError, ijson.JSONError) as e:
+        raise ConnectionError(f"Ошибка подключения к Jira: {str(e)}")
+    
+    return all_issues
 
 def analyze_with_deepseek(issues: List[Dict[str, Any]], epic_summary: str) -> str:
     """Анализирует задачи с помощью DeepSeek API."""
-    headers = {
-        "Authorization": f"Bearer {CONFIG['deepseek']['api_key']}",
-        "Content-Type": "application/json"
-    }
-    
-    tasks_text = "\n".join(
-        f"{i+1}. {issue.get('key', 'N/A')} ({issue.get('fields', {}).get('issuetype', {}).get('name', 'N/A')}): "
-        f"{issue.get('fields', {}).get('summary', 'N/A')} "
-        f"(Status: {issue.get('fields', {}).get('status', {}).get('name', 'N/A')}, "
-        f"Priority: {issue.get('fields', {}).get('priority', {}).get('name', 'N/A')})"
-        for i, issue in enumerate(issues[:50])
+    lines = []
+    for i, issue in enumerate(issues[:50], start=1):
+        fields = issue.get("fields") or {}
+        lines.append(
+            f"{i}. {issue.get('key', 'N/A')} ({fields.get('issuetype', {}).get('name', 'N/A')}): "
+            f"{fields.get('summary', 'N/A')} "
+            f"(Status: {fields.get('status', {}).get('name', 'N/A')}, "
+            f"Priority: {fields.get('priority', {}).get('name', 'N/A')})"
+        )
+    tasks_text = "\n".join(lines)
     
     prompt = {
         "model": CONFIG["deepseek"]["model"],
@@ -159,38 +297,104 @@ def analyze_with_deepseek(issues: List[Dict[str, Any]], epic_summary: str) -> st
     }
     
     try:
-        response = requests.post(
+        response = DS_SESSION.post(
             CONFIG["deepseek"]["api_url"],
-            headers=headers,
-            json=prompt,
+            data=orjson.dumps(prompt),
             timeout=60
         )
         response.raise_for_status()
-        return response.json().get("choices", [{}])[0].get("message", {}).get("content", "Анализ недоступен")
-    except requests.exceptions.RequestException as e:
+        return orjson.loads(response.content).get("choices", [{}])[0].get("message", {}).get("content", ANALYSIS_EMPTY)
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         logger.error(f"Ошибка DeepSeek API: {str(e)}")
-        return "Анализ временно недоступен"
+        return ANALYSIS_UNAVAILABLE
+
+def get_page_title(epic_info: Dict[str, Any]) -> str:
+    """Возвращает заголовок страницы Confluence для эпика."""
+    return f"Статус эпика {epic_info['key']} - {epic_info['summary']}"
 
-def find_confluence_page(epic_key: str) -> Optional[Dict[str, Any]]:
-    """Ищет страницу в Confluence по ключу эпика."""
-    url = f"{CONFIG['confluence']['url']}/rest/api/content?spaceKey={CONFIG['confluence']['space_key']}&title=Статус эпика {epic_key}"
+def page_metadata(page: Dict[str, Any]) -> Dict[str, Any]:
+    """Оставляет от ответа Confluence только метаданные страницы, которые хранятся в кэше."""
+    return {
+        "id": page["id"],
+        "version": {"number": page["version"]["number"]},
+        "_links": {"webui": page["_links"]["webui"]}
+    }
+
+def find_confluence_page(epic_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Ищет страницу в Confluence по заголовку страницы эпика."""
+    cache_name = f"confluence_page_{epic_info['key']}.json"
+    cached = load_cache(cache_name)
+    # Id найденной страницы не меняется, поэтому вместо поиска по заголовку страница
+    # запрашивается по id: так видны и правки вне скрипта, и удаление страницы.
+    # Запрос условный: если страница не менялась, Confluence отвечает 304 без тела
+    if cached and cached.get("page"):
+        url = f"{CONFIG['confluence']['url']}/rest/api/content/{cached['page']['id']}?expand=version"
+        headers = {"If-None-Match": cached["etag"]} if cached.get("etag") else {}
+        try:
+            response = CONF_SESSION.get(url, headers=headers, timeout=30)
+            if response.status_code == 304:
+                return cached["page"]
+            if response.status_code != 404:
+                response.raise_for_status()
+                page = page_metadata(orjson.loads(response.content))
+                save_cache(cache_name, {"etag": response.headers.get("ETag"), "page": page})
+                return page
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            raise ConnectionError(f"Ошибка подключения к Confluence: {str(e)}")
+        # Страница удалена: кэш сбрасывается, страница ищется по заголовку
+        save_cache(cache_name, {})
+    
+    url = f"{CONFIG['confluence']['url']}/rest/api/content"
+    params = {
+        "spaceKey": CONFIG["confluence"]["space_key"],
+        "title": get_page_title(epic_info),
+        "expand": "version"
+    }
     try:
-        response = requests.get(
-            url,
-            auth=HTTPBasicAuth(CONFIG["confluence"]["api_user"], CONFIG["confluence"]["api_token"]),
-            timeout=30
-        )
+        response = CONF_SESSION.get(url, params=params, timeout=30)
         response.raise_for_status()
-        results = response.json().get("results", [])
-        return results[0] if results else None
-    except requests.exceptions.RequestException as e:
+        results = orjson.loads(response.content).get("results", [])
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         raise ConnectionError(f"Ошибка подключения к Confluence: {str(e)}")
+    
+    if not results:
+        return None
+    page = page_metadata(results[0])
+    save_cache(cache_name, {"page": page})
+    return page
 
-def update_confluence_page(existing_page: Optional[Dict[str, Any]], content: str, epic_info: Dict[str, Any]) -> Dict[str, Any]:
+def get_page_version(page_id: str) -> int:
+    """Запрашивает текущий номер версии страницы Confluence по ее id."""
+    url = f"{CONFIG['confluence']['url']}/rest/api/content/{page_id}?expand=version"
+    response = CONF_SESSION.get(url, timeout=30)
+    response.raise_for_status()
+    return orjson.loads(response.content)["version"]["number"]
+
+def content_fingerprint(issues: List[Dict[str, Any]], epic_info: Dict[str, Any]) -> str:
+    """Хэширует данные, из которых строится страница Confluence."""
+    # Ответ LLM меняется при каждом запуске, поэтому в хэш входят только эпик, задачи и шаблон
+    payload = orjson.dumps(
+        {"epic": epic_info, "issues": issues, "template": PAGE_TEMPLATE},
+        default=str,
+        option=orjson.OPT_SORT_KEYS
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+def is_page_current(existing_page: Dict[str, Any], epic_key: str, content_hash: str) -> bool:
+    """Проверяет, что страница записана скриптом из тех же данных и с тех пор не менялась."""
+    cached = load_cache(f"epic_{epic_key}.json")
+    return bool(
+        cached
+        and cached.get("hash") == content_hash
+        and cached.get("version") == existing_page["version"]["number"]
+    )
+
+def update_confluence_page(existing_page: Optional[Dict[str, Any]], content: str, epic_info: Dict[str, Any], content_hash: Optional[str]) -> Dict[str, Any]:
     """Обновляет или создает страницу в Confluence."""
-    page_title = f"Статус эпика {epic_info['key']} - {epic_info['summary']}"
+    page_title = get_page_title(epic_info)
     api_url = CONFIG["confluence"]["url"]
-    auth = HTTPBasicAuth(CONFIG["confluence"]["api_user"], CONFIG["confluence"]["api_token"])
+    cache_name = f"epic_{epic_info['key']}.json"
+    page_cache_name = f"confluence_page_{epic_info['key']}.json"
     
     data = {
         "type": "page",
@@ -212,25 +416,35 @@ def update_confluence_page(existing_page: Optional[Dict[str, Any]], content: str
         data["space"] = {"key": CONFIG["confluence"]["space_key"]}
         method = "POST"
     
-    try:
-        response = requests.request(
+    def send() -> requests.Response:
+        return CONF_SESSION.request(
             method,
             url,
-            auth=auth,
             headers={"Content-Type": "application/json"},
-            json=data,
+            data=orjson.dumps(data),
             timeout=30
         )
+    
+    try:
+        response = send()
+        if existing_page and response.status_code == 409:
+            # Страницу изменили вне скрипта: версия уточняется по id, запись повторяется
+            data["version"] = {"number": get_page_version(existing_page["id"]) + 1}
+            response = send()
+        if existing_page and response.status_code == 404:
+            # Страница удалена: в следующий раз она будет найдена или создана заново
+            save_cache(page_cache_name, {})
         response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        result = orjson.loads(response.content)
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         raise ConnectionError(f"Ошибка Confluence API: {str(e)}")
-
-def generate_content(issues: List[Dict[str, Any]], analysis: str, epic_info: Dict[str, Any]) -> str:
-    """Генерирует HTML-контент для страницы Confluence."""
-    last_update = time.strftime("%Y-%m-%d %H:%M:%S")
     
-    styles = """
+    # Без хэша (анализ не получен) следующий запуск не пропустит обновление
+    save_cache(cache_name, {"hash": content_hash, "version": result["version"]["number"]})
+    save_cache(page_cache_name, {"etag": response.headers.get("ETag"), "page": page_metadata(result)})
+    return result
+
+PAGE_TEMPLATE = """
     <style>
         .task-table {
             width: 100%;
@@ -278,14 +492,10 @@ def generate_content(issues: List[Dict[str, Any]], analysis: str, epic_info: Dic
         .priority-medium { background-color: #FFF9C4; color: #F9A825; }
         .priority-low { background-color: #C8E6C9; color: #388E3C; }
     </style>
-    """
     
-    header = f"""
-    <h1>Статус эпика: {escape(epic_info['key'])} - {escape(epic_info['summary'])}</h1>
-    <div class="task-description">{markdown(escape(epic_info.get('description', 'Описание отсутствует')))}</div>
-    """
+    <h1>Статус эпика: {{ epic.key }} - {{ epic.summary }}</h1>
+    <div class="task-description">{{ epic_description }}</div>
     
-    tasks_table = """
     <h2>Задачи</h2>
     <table class="task-table">
         <tr>
@@ -295,98 +505,132 @@ def generate_content(issues: List[Dict[str, Any]], analysis: str, epic_info: Dic
             <th style="width: 15%">Исполнитель</th>
             <th style="width: 15%">Обновлено</th>
         </tr>
-    """
-    
-    for issue in issues:
-        fields = issue.get("fields", {})
-        key = issue.get("key", "N/A")
-        summary = escape(fields.get("summary", "N/A"))
-        status = escape(fields.get("status", {}).get("name", "N/A"))
-        issue_type = escape(fields.get("issuetype", {}).get("name", "N/A"))
-        priority = escape(fields.get("priority", {}).get("name", "N/A"))
-        assignee = escape(fields.get("assignee", {}).get("displayName", "Не назначен")) if fields.get("assignee") else "Не назначен"
-        updated = escape(fields.get("updated", "")[:10])
-        description = escape(fields.get("description", ""))
-        
-        status_class = ""
-        if "готов" in status.lower():
-            status_class = "status-done"
-        elif "прогрес" in status.lower():
-            status_class = "status-inprogress"
-        else:
-            status_class = "status-open"
-            
-        priority_class = ""
-        if "высок" in priority.lower():
-            priority_class = "priority-high"
-        elif "средн" in priority.lower():
-            priority_class = "priority-medium"
-        else:
-            priority_class = "priority-low"
-        
-        tasks_table += f"""
+    {% for key, issue_type, priority_class, priority, summary, description, status_class, status, assignee, updated in tasks %}
         <tr>
-            <td><a href="{CONFIG['jira']['url']}/browse/{key}" target="_blank">{key}</a></td>
+            <td><a href="{{ jira_url }}/browse/{{ key }}" target="_blank">{{ key }}</a></td>
             <td>
                 <div>
-                    <span class="task-type">{issue_type}</span>
-                    <span class="{priority_class}">{priority}</span>
+                    <span class="task-type">{{ issue_type }}</span>
+                    <span class="{{ priority_class }}">{{ priority }}</span>
                 </div>
-                <strong>{summary}</strong>
-                <div class="task-description">{markdown(description) if description else 'Нет описания'}</div>
+                <strong>{{ summary }}</strong>
+                <div class="task-description">{{ description }}</div>
             </td>
-            <td class="{status_class}">{status}</td>
-            <td>{assignee}</td>
-            <td>{updated}</td>
+            <td class="{{ status_class }}">{{ status }}</td>
+            <td>{{ assignee }}</td>
+            <td>{{ updated }}</td>
         </tr>
-        """
-    
-    tasks_table += "</table>"
+    {% endfor %}
+    </table>
     
-    analysis_block = f"""
     <div class="analysis-block">
         <h2>Анализ выполнения</h2>
-        {analysis.replace('\n', '<br>')}
+        {{ analysis }}
     </div>
-    """
     
-    footer = f"""
     <div style="margin-top: 30px; color: #777; font-size: 0.9em;">
-        <p>Последнее обновление: {last_update}</p>
+        <p>Последнее обновление: {{ last_update }}</p>
         <p>Страница автоматически сгенерирована</p>
     </div>
     """
+
+# Шаблон компилируется один раз; autoescape экранирует все поля, кроме помеченных Markup
+TEMPLATE = Environment(autoescape=True, trim_blocks=True).from_string(PAGE_TEMPLATE)
+
+# Подстроки статусов и приоритетов и соответствующие им CSS-классы
+STATUS_CLASSES = (("готов", "status-done"), ("прогрес", "status-inprogress"))
+PRIORITY_CLASSES = (("высок", "priority-high"), ("средн", "priority-medium"))
+
+@lru_cache(maxsize=256)
+def classify(value: str, rules: Tuple[Tuple[str, str], ...], default: str) -> str:
+    """Подбирает CSS-класс по подстроке; результат для каждого названия вычисляется один раз."""
+    value = value.lower()
+    return next((cls for marker, cls in rules if marker in value), default)
+
+# Один экземпляр парсера на все вызовы вместо нового на каждую задачу
+MARKDOWN = Markdown()
+
+@lru_cache(maxsize=512)
+def render_markdown(text: str) -> str:
+    """Преобразует Markdown в HTML с кэшированием повторяющихся описаний."""
+    return MARKDOWN.reset().convert(text)
+
+def iter_content(issues: List[Dict[str, Any]], analysis: str, epic_info: Dict[str, Any]) -> Iterator[str]:
+    """Последовательно выдает фрагменты HTML-контента страницы Confluence."""
+    # Сначала поля всех задач извлекаются колонками; экранирование выполняет шаблон
+    fields_list = [issue.get("fields", {}) for issue in issues]
+    keys = [issue.get("key", "N/A") for issue in issues]
+    summaries = [fields.get("summary", "N/A") for fields in fields_list]
+    statuses = [fields.get("status", {}).get("name", "N/A") for fields in fields_list]
+    issue_types = [fields.get("issuetype", {}).get("name", "N/A") for fields in fields_list]
+    priorities = [fields.get("priority", {}).get("name", "N/A") for fields in fields_list]
+    assignees = [
+        fields["assignee"].get("displayName", "Не назначен") if fields.get("assignee") else "Не назначен"
+        for fields in fields_list
+    ]
+    updated_dates = [fields.get("updated", "")[:10] for fields in fields_list]
+    descriptions = [
+        Markup(render_markdown(escape(description))) if description else 'Нет описания'
+        for description in (fields.get("description", "") for fields in fields_list)
+    ]
+    status_classes = [classify(status, STATUS_CLASSES, "status-open") for status in statuses]
+    priority_classes = [classify(priority, PRIORITY_CLASSES, "priority-low") for priority in priorities]
     
-    return styles + header + tasks_table + analysis_block + footer
+    return TEMPLATE.generate(
+        epic=epic_info,
+        epic_description=Markup(render_markdown(escape(epic_info.get('description', 'Описание отсутствует')))),
+        jira_url=CONFIG["jira"]["url"],
+        tasks=zip(
+            keys, issue_types, priority_classes, priorities, summaries, descriptions,
+            status_classes, statuses, assignees, updated_dates
+        ),
+        analysis=Markup(analysis.replace('\n', '<br>')),
+        last_update=time.strftime("%Y-%m-%d %H:%M:%S")
+    )
+
+def generate_content(issues: List[Dict[str, Any]], analysis: str, epic_info: Dict[str, Any]) -> str:
+    """Генерирует HTML-контент для страницы Confluence."""
+    # Фрагменты собираются в итоговую строку за одно выделение памяти
+    return "".join(iter_content(issues, analysis, epic_info))
 
 def main():
     """Основная функция выполнения скрипта."""
     try:
-        # Проверка зависимостей
-        try:
-            import importlib
-            import pkg_resources
-        except ImportError:
-            logger.error("Необходимые модули для проверки зависимостей не установлены")
-            if not os.path.exists("requirements.txt"):
-                create_default_requirements()
-            logger.info("Пожалуйста, установите зависимости командой: pip install -r requirements.txt")
-            sys.exit(1)
-        
-        check_dependencies()
+        # Проверку зависимостей можно отключить в CI и при повторных запусках
+        if os.environ.get("SKIP_DEP_CHECK") != "1":
+            check_dependencies()
         
         if not os.path.exists("requirements.txt"):
             create_default_requirements()
         
+        CONFIG.update(load_config())
+        configure_sessions()
+        
         epic_key = CONFIG["epic_key"]
         logger.info(f"Обработка эпика: {epic_key}")
         
-        epic_info = get_epic_info(epic_key)
-        issues = get_jira_issues(epic_key)
-        analysis = analyze_with_deepseek(issues, epic_info["summary"])
-        content = generate_content(issues, analysis, epic_info)
-        page = find_confluence_page(epic_key)
-        result = update_confluence_page(page, content, epic_info)
+        # Независимые запросы выполняются одновременно: поиск страницы в Confluence
+        # ждет только заголовок эпика и идет параллельно с загрузкой задач
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            epic_future = executor.submit(get_epic_info, epic_key)
+            issues_future = executor.submit(get_jira_issues, epic_key)
+            epic_info = epic_future.result()
+            page_future = executor.submit(find_confluence_page, epic_info)
+            issues = issues_future.result()
+            page = page_future.result()
+        
+        # Решение о пропуске принимается до запроса к DeepSeek, чтобы не тратить
+        # платный вызов на страницу, которая не будет записана
+        content_hash = content_fingerprint(issues, epic_info)
+        if page and is_page_current(page, epic_key, content_hash):
+            logger.info("Данные эпика не изменились, анализ и обновление страницы пропущены")
+            result = page
+        else:
+            analysis = analyze_with_deepseek(issues, epic_info["summary"])
+            if analysis in (ANALYSIS_EMPTY, ANALYSIS_UNAVAILABLE):
+                content_hash = None
+            content = generate_content(issues, analysis, epic_info)
+            result = update_confluence_page(page, content, epic_info, content_hash)
         
         logger.info(f"Успешно! Страница доступна по адресу: {CONFIG['confluence']['url']}{result['_links']['webui']}")
     